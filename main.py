@@ -1,12 +1,20 @@
+import sys
 import searxng
 
 if __name__ == "__main__":
     api = searxng.SearXNG("https://search.vtallen.com")
 
-    responses = api.search_n("xbox series x", 5)
+    responses = api.search("xbox series x", 5)
 
-    print(f"Found {len(responses)} links")
-    print("==============================================")
-    print()
-    for response in responses:
-        print(str(response))
+    # Built into a single buffer so the whole listing goes out in one write
+    sys.stdout.write(
+        "\n".join(
+            [
+                f"Found {len(responses)} links",
+                "==============================================",
+                "",
+            ]
+            + [str(response) for response in responses]
+        )
+        + "\n"
+    )
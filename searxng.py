@@ -1,31 +1,108 @@
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlencode
+import asyncio
+import functools
+import attrs
+import sys
+import threading
+import aiohttp
 import requests
-import json
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    from orjson import dumps as _dumps, loads as _loads
+except ImportError:
+    import json
+    from json import loads as _loads
+
+    def _dumps(obj) -> bytes:
+        # Compact and unescaped UTF-8 so the output matches orjson's
+        return json.dumps(obj, separators=(",", ":"), ensure_ascii=False).encode()
+
+try:
+    import simdjson
+except ImportError:
+    simdjson = None
+
+try:
+    import cachetools
+except ImportError:
+    cachetools = None
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+# requests and aiohttp can only decode brotli bodies when one of these packages is installed
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+# Sent with every request, the JSON responses compress very well
+_HEADERS = {
+    "Accept-Encoding": "gzip, deflate" if brotli is None else "gzip, deflate, br",
+    "User-Agent": "searxng-python-client/1.0",
+}
+
+# Each thread lazily gets its own simdjson parser, so the buffers are reused between
+# responses without threads ever sharing one parser
+_thread_local = threading.local()
+
+
+def _parse_document(content: bytes) -> "simdjson.Object":
+    """
+    Parses content with the calling thread's simdjson parser, creating the parser on first use
+
+    A parser can not be reused while objects from its previous document are still alive, which happens whenever an
+    exception raised while reading that document is still referenced (e.g. inside an except block, or kept by
+    asyncio.gather). In that case the parser is replaced with a fresh one, the old one stays alive for as long as its
+    objects do.
+
+    Args:
+        content (bytes): The JSON document to parse
+
+    Returns:
+        simdjson.Object: The lazily parsed document
+    """
+    parser = getattr(_thread_local, "parser", None)
+    if parser is None:
+        parser = _thread_local.parser = simdjson.Parser()
+
+    try:
+        return parser.parse(content)
+    except RuntimeError:
+        parser = _thread_local.parser = simdjson.Parser()
+        return parser.parse(content)
 
 
+@attrs.define(slots=True, frozen=True)
 class SearchResult:
     """
     A storage class that holds the information for a singal search result from the SearXNG API
-    """
 
-    def __init__(
-        self, url: str, title: str, thumbnail: str, positions: List[str], score: float
-    ) -> None:
-        """
-        Takes the arguments and stores them in the class
+    Instances are immutable and hashable, so duplicate results can be removed with a set
 
-        Args:
-            url             (str): The url of the search result
-            title           (str): The title of the page referenced by this search result
-            thumbnail       (str): The url for the thumbnail of the result (if exists)
-            positions (List[str]): The position of this result in the search results from each engine that returned this url
-            score         (float): The search engine ranking for how close of a match to the query this result is
-        """
-        self.url = url
-        self.title = title
-        self.thumbnail = thumbnail
-        self.positions = positions
-        self.score = score
+    Attributes:
+        url                   (str): The url of the search result
+        title                 (str): The title of the page referenced by this search result
+        thumbnail             (str): The url for the thumbnail of the result (if exists)
+        positions (Tuple[int, ...]): The position of this result in the search results from each engine that returned this url
+        score               (float): The search engine ranking for how close of a match to the query this result is
+        engines   (Tuple[str, ...]): The names of the engines that returned this url
+    """
+
+    url: str
+    title: str
+    thumbnail: str
+    positions: Tuple[int, ...]
+    score: float
+    engines: Tuple[str, ...] = ()
 
     def __str__(self) -> str:
         """
@@ -34,7 +111,20 @@ class SearchResult:
         Returns:
             str: The string representation of this class
         """
-        return f"url:{self.url}\ntitle:{self.title}\nthumbnail:{self.thumbnail}\npositions:{self.positions}\nscore:{self.score}\n"
+        return f"url:{self.url}\ntitle:{self.title}\nthumbnail:{self.thumbnail}\npositions:{self.positions}\nscore:{self.score}\nengines:{self.engines}\n"
+
+    @staticmethod
+    def dump_all(results: List["SearchResult"]) -> bytes:
+        """
+        Serializes a list of search results into a JSON array in one go, using orjson if it is installed
+
+        Args:
+            results (List[SearchResult]): The search results to serialize
+
+        Returns:
+            bytes: The UTF-8 encoded JSON array, one object per result
+        """
+        return _dumps([attrs.asdict(result) for result in results])
 
 
 class SearchParameters:
@@ -43,21 +133,35 @@ class SearchParameters:
 
     This class does not include the "q" (query) parameter, it must be added by the code using this class before the parameters are
     set into the http request
+
+    The list parameters are stored as tuples so they can not be changed in place, assign a new sequence to change them
     """
 
+    # Fields given as lists that are stored as tuples
+    _SEQUENCE_FIELDS = frozenset(
+        (
+            "categories",
+            "engines",
+            "enabled_plugins",
+            "disabled_plugins",
+            "enabled_engines",
+            "disabled_engines",
+        )
+    )
+
     def __init__(
         self,
-        categories: List[str] = [],
-        engines: List[str] = [],
+        categories: Optional[List[str]] = None,
+        engines: Optional[List[str]] = None,
         language: str = "",
         pageno: int = 1,
         time_range: str = "",
         image_proxy: bool = True,
         safe_search: str = "",
-        enabled_plugins: List[str] = [],
-        disabled_plugins: List[str] = [],
-        enabled_engines: List[str] = [],
-        disabled_engines: List[str] = [],
+        enabled_plugins: Optional[List[str]] = None,
+        disabled_plugins: Optional[List[str]] = None,
+        enabled_engines: Optional[List[str]] = None,
+        disabled_engines: Optional[List[str]] = None,
     ):
         """
         Sets the internal members of the class to the constructor arguments
@@ -77,20 +181,81 @@ class SearchParameters:
             enabled_engines  (List[str]): A list of engines that should be enabled for the search
             disabled_engines (List[str]): A list of engines that should be disabled for the search
         """
-        self.categories = categories
-        self.engines = engines
+        # The params dictionary built by as_dict, cleared whenever a public member is set
+        self._cached_dict = None
+
+        self.categories = () if categories is None else categories
+        self.engines = () if engines is None else engines
         self.language = language
         self.pageno = pageno
         self.time_range = time_range
         self.image_proxy = image_proxy
         self.safe_search = safe_search
-        self.enabled_plugins = enabled_plugins
-        self.disabled_plugins = disabled_plugins
-        self.enabled_engines = enabled_engines
-        self.disabled_engines = disabled_engines
+        self.enabled_plugins = () if enabled_plugins is None else enabled_plugins
+        self.disabled_plugins = () if disabled_plugins is None else disabled_plugins
+        self.enabled_engines = () if enabled_engines is None else enabled_engines
+        self.disabled_engines = () if disabled_engines is None else disabled_engines
 
         self.format = "json"
 
+    def __setattr__(self, name: str, value) -> None:
+        """
+        Sets the member and clears the cached as_dict result if the member is public
+
+        Args:
+            name   (str): The name of the member to set
+            value  (Any): The value to set it to, lists are converted to tuples and None to an empty tuple
+        """
+        if name in self._SEQUENCE_FIELDS:
+            value = () if value is None else tuple(value)
+
+        super().__setattr__(name, value)
+
+        if not name.startswith("_"):
+            super().__setattr__("_cached_dict", None)
+
+    @property
+    def pageno(self) -> int:
+        """
+        Returns the page of the search results to request
+
+        Returns:
+            int: The page number
+        """
+        return self._pageno
+
+    @pageno.setter
+    def pageno(self, value: int) -> None:
+        """
+        Sets the page number, and stores the string form that is sent to the api so as_dict never has to convert it
+
+        Args:
+            value (int): The page number
+        """
+        self._pageno = value
+        self._pageno_str = str(value)
+
+    @property
+    def image_proxy(self) -> bool:
+        """
+        Returns whether or not images are proxied through the SearXNG instance
+
+        Returns:
+            bool: Whether the image proxy is enabled
+        """
+        return self._image_proxy
+
+    @image_proxy.setter
+    def image_proxy(self, value: bool) -> None:
+        """
+        Sets whether to proxy images, and stores the string form that is sent to the api so as_dict never has to convert it
+
+        Args:
+            value (bool): Whether to enable the image proxy
+        """
+        self._image_proxy = value
+        self._image_proxy_str = str(value)
+
     def update(
         self,
         categories=None,
@@ -122,51 +287,42 @@ class SearchParameters:
             disabled_engines (List[str]): A list of engines that should be disabled for the search
 
         """
-        if categories != None:
-            self.categories = categories
-
-        if engines != None:
-            self.engines = engines
-
-        if language != None:
-            self.language = language
-
-        if pageno != None:
-            self.pageno = pageno
-
-        if time_range != None:
-            self.time_range = time_range
-
-        if image_proxy != None:
-            self.image_proxy = image_proxy
-
-        if safe_search != None:
-            self.safe_search = safe_search
-
-        if enabled_plugins != None:
-            self.enabled_plugins = enabled_plugins
-
-        if disabled_plugins != None:
-            self.disabled_plugins = disabled_plugins
-
-        if enabled_engines != None:
-            self.enabled_engines = enabled_engines
-
-        if disabled_engines != None:
-            self.disabled_engines = disabled_engines
+        arguments = locals()
+        for name in (
+            "categories",
+            "engines",
+            "language",
+            "pageno",
+            "time_range",
+            "image_proxy",
+            "safe_search",
+            "enabled_plugins",
+            "disabled_plugins",
+            "enabled_engines",
+            "disabled_engines",
+        ):
+            value = arguments[name]
+            if value is not None:
+                setattr(self, name, value)
 
     def as_dict(self):
         """
         Converts the members of this class into a dictionary that can be passed to a requests object for a request to the
         SearXNG API.
 
+        The dictionary is only built once and then cached until a public member is set again. A copy of the cached dictionary is
+        returned, so callers are free to modify it.
+
         Returns:
             dict - the params dictionary representation of this class
         """
+        if self._cached_dict is not None:
+            return self._cached_dict.copy()
+
         param_dict = {
-            "pageno": str(self.pageno),
+            "pageno": self._pageno_str,
             "format": self.format,
-            "image_proxy": str(self.image_proxy),
+            "image_proxy": self._image_proxy_str,
         }
 
         if self.categories:
@@ -193,23 +349,79 @@ class SearchParameters:
         if self.disabled_engines:
             param_dict.update({"disabled_engines": ",".join(self.disabled_engines)})
 
-        return param_dict
+        self._cached_dict = param_dict
+        return param_dict.copy()
 
 
 class SearXNG:
     def __init__(
-        self, base_url: str, search_params: SearchParameters = SearchParameters()
+        self,
+        base_url: str,
+        search_params: Optional[SearchParameters] = None,
+        cache_size: int = 256,
+        ttl_seconds: Optional[float] = None,
+        stream: bool = False,
     ) -> None:
         """
         Sets the api endpoint and default search parameters
 
+        Pages fetched by the blocking search methods are cached in memory, keyed by the full request url. By default the
+        cache only evicts the least recently used pages, pass ttl_seconds to also expire pages after that long (requires cachetools)
+
         Args:
             base_url                   (str): The url of the SearXNG instance. This should be the base URL, not the api endpoint
             search_params (SearchParameters): The SearchParameters object contining the default parameters to be used in searches from this object
                                               if not provided, the defaults will be used
+            cache_size                 (int): The maximum number of pages to keep cached, 0 disables the cache
+            ttl_seconds              (float): How long a cached page stays valid for, if not provided pages never expire
+            stream                    (bool): Whether the blocking search methods parse page bodies with ijson while they are still
+                                              downloading (requires ijson). Decoding whole bodies is faster on a fast connection
         """
         self.endpoint = base_url + "/search"
-        self.search_params = search_params
+        self.search_params = (
+            search_params if search_params is not None else SearchParameters()
+        )
+
+        # Keep-alive connection pool shared by all blocking requests from this object
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=16,
+            max_retries=Retry(total=2, backoff_factor=0.2),
+        )
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(_HEADERS)
+
+        if stream and ijson is None:
+            raise ImportError("stream requires the ijson package to be installed")
+        self.stream = stream
+
+        # Wraps the bound method, so every object gets its own cache
+        if ttl_seconds is None:
+            self._fetch_page = functools.lru_cache(maxsize=cache_size)(
+                self._fetch_page
+            )
+        elif cachetools is None:
+            raise ImportError(
+                "ttl_seconds requires the cachetools package to be installed"
+            )
+        else:
+            self._fetch_page = cachetools.cached(
+                cachetools.TTLCache(maxsize=cache_size, ttl=ttl_seconds)
+            )(self._fetch_page)
+
+    def close(self) -> None:
+        """
+        Closes the underlying http session and any pooled connections it holds
+        """
+        self.session.close()
+
+    def __enter__(self) -> "SearXNG":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
 
     def parse_api_json(self, json: dict) -> List[SearchResult]:
         """
@@ -221,24 +433,175 @@ class SearXNG:
         Returns:
             List[SearchResult] - The list of search results represented by the json
         """
+        return self.parse_api_results(json["results"])
+
+    def parse_api_results(self, results: Iterable[dict]) -> List[SearchResult]:
+        """
+        Takes the entries of the "results" list from the SearXNG api and parses them into a list of SearchResult objects
+
+        Args:
+            results (Iterable[dict]): The result entries, either a decoded list or a stream of them
+
+        Returns:
+            List[SearchResult] - The list of search results represented by the entries
+        """
+        # Bound to locals so the loop below only does fast local lookups
+        result_class = SearchResult
+        to_float = float
+        to_tuple = tuple
+        intern = sys.intern
+
         assembled_list = []
-        for current_dict in json["results"]:
-            assembled_list.append(
-                SearchResult(
-                    url=current_dict.get("url", ""),
-                    title=current_dict.get("title", ""),
-                    thumbnail=current_dict.get("thumbnail", ""),
-                    positions=current_dict.get("positions", ""),
-                    score=float(current_dict.get("score", 0)),
+        append = assembled_list.append
+        for current_dict in results:
+            get = current_dict.get
+            append(
+                result_class(
+                    get("url", ""),
+                    get("title", ""),
+                    get("thumbnail", ""),
+                    to_tuple(get("positions") or ()),
+                    to_float(get("score", 0)),
+                    # Only a handful of engine names repeat across every result, so they share one string each
+                    to_tuple([intern(engine) for engine in get("engines") or ()]),
                 )
             )
 
         return assembled_list
 
+    def parse_api_response(self, content: bytes) -> List[SearchResult]:
+        """
+        Takes the raw body of a response from the SearXNG api and parses it into a list of SearchResult objects
+
+        If pysimdjson is installed, the body is parsed lazily and only the fields stored in SearchResult are ever converted
+        into python objects. Parsers are never shared between threads and are replaced if a failed parse left objects from
+        their last document alive, so this is safe to call from several threads and again after a failure. Otherwise the whole
+        body is decoded and handed to parse_api_json.
+
+        Args:
+            content (bytes): The body of an api response
+
+        Returns:
+            List[SearchResult] - The list of search results represented by the body
+        """
+        if simdjson is None:
+            return self.parse_api_json(_loads(content))
+
+        return self.parse_api_results(_parse_document(content)["results"])
+
+    async def _fetch_page_async(
+        self, session: aiohttp.ClientSession, url: str
+    ) -> List[SearchResult]:
+        """
+        Requests a single page of results from the API and parses it
+
+        Args:
+            session (aiohttp.ClientSession): The session to make the request with
+            url                       (str): The full request url, with the url encoded params (including "q" and "pageno")
+
+        Returns:
+            List[SearchResult] - The search results on the requested page
+        """
+        async with session.get(url) as response:
+            if response.status != 200:
+                raise ValueError(
+                    f"searxng endpoint={self.endpoint} status code was not 200, got={response.status}"
+                )
+
+            return self.parse_api_response(await response.read())
+
+    def _fetch_page(self, url: str) -> List[SearchResult]:
+        """
+        Requests a single page of results from the API over this object's session and parses it
+
+        Results are cached per object (see __init__), so the returned list must not be modified
+
+        If streaming was enabled in __init__, the body is parsed by ijson as its bytes arrive instead of after the whole body
+        has been received.
+
+        Args:
+            url (str): The full request url, with the url encoded params (including "q" and "pageno")
+
+        Returns:
+            List[SearchResult] - The search results on the requested page
+        """
+        with self.session.get(url, stream=self.stream) as response:
+            if response.status_code != 200:
+                raise ValueError(
+                    f"searxng endpoint={self.endpoint} status code was not 200, got={response.status_code}"
+                )
+
+            if not self.stream:
+                return self.parse_api_response(response.content)
+
+            response.raw.decode_content = True
+            has_results = False
+
+            def events():
+                # Flags the top level "results" key, then passes the rest through
+                nonlocal has_results
+                parser = ijson.parse(response.raw)
+                for event in parser:
+                    yield event
+                    if event[0] == "results":
+                        has_results = True
+                        break
+
+                yield from parser
+
+            results = self.parse_api_results(ijson.items(events(), "results.item"))
+            if not has_results:
+                # Matches the KeyError raised by the other parsing paths
+                raise KeyError("results")
+
+            return results
+
+    async def search_async(self, query: str, n_pages: int = 1, search_params=None):
+        """
+        Preforms a search on the API. If more than 1 page of results has been requested, then a seperate request will be made
+        for each page. All of the page requests are made concurrently.
+
+        If no SearchParameters object is provided in the argument search_params, then this class's set defaults will be used instead
+
+        Args:
+            query                      (str): The serch to preform
+            n_pages                    (int): The number of search results pages to request
+            search_params (SearchParameters): The parameters to use for the search
+
+        Returns:
+            List[SearchResult] - A list of the search results of query, in page order
+
+        """
+        if search_params is None:
+            search_params = self.search_params.as_dict()
+        else:
+            search_params = search_params.as_dict()
+
+        search_params.update({"q": query})
+
+        # Only pageno changes between pages, so everything else is url encoded once
+        search_params.pop("pageno")
+        base_url = f"{self.endpoint}?{urlencode(search_params)}&pageno="
+
+        async with aiohttp.ClientSession(headers=_HEADERS) as session:
+            pages = await asyncio.gather(
+                *[
+                    self._fetch_page_async(session, f"{base_url}{idx}")
+                    for idx in range(1, n_pages + 1)
+                ]
+            )
+
+        results = []
+        for page in pages:
+            results.extend(page)
+
+        return results
+
     def search(self, query: str, n_pages: int = 1, search_params=None):
         """
         Preforms a search on the API. If more than 1 page of results has been requested, then a seperate request will be made
-        for each page.
+        for each page. Pages are requested one after another over this object's pooled session, use search_async to request
+        them concurrently instead.
 
         If no SearchParameters object is provided in the argument search_params, then this class's set defaults will be used instead
 
@@ -251,28 +614,102 @@ class SearXNG:
             List[SearchResult] - A list of the search results of query
 
         """
-        if search_params == None:
+        if search_params is None:
             search_params = self.search_params.as_dict()
         else:
             search_params = search_params.as_dict()
 
         search_params.update({"q": query})
 
+        # Only pageno changes between pages, so everything else is url encoded once
+        search_params.pop("pageno")
+        base_url = f"{self.endpoint}?{urlencode(search_params)}&pageno="
+
         results = []
         for idx in range(1, n_pages + 1):
-            search_params["pageno"] = str(idx)
+            results.extend(self._fetch_page(f"{base_url}{idx}"))
 
-            response = requests.get(self.endpoint, params=search_params)
+        return results
 
-            if response.status_code != 200:
-                raise ValueError(
-                    f"searxng endpoint={self.endpoint} status code was not 200, got={response.status_code}"
-                )
+    async def search_many_async(
+        self,
+        queries: List[str],
+        n_pages: int = 1,
+        search_params=None,
+        concurrency: int = 8,
+    ) -> Dict[str, List[SearchResult]]:
+        """
+        Preforms a search on the API for each query in queries. Every page of every query is requested concurrently over a single
+        session, with at most concurrency requests in flight at once so the SearXNG instance is not flooded.
+
+        If no SearchParameters object is provided in the argument search_params, then this class's set defaults will be used instead
+
+        Args:
+            queries              (List[str]): The searches to preform
+            n_pages                    (int): The number of search results pages to request for each query
+            search_params (SearchParameters): The parameters to use for the searches
+            concurrency                (int): The maximum number of requests to have open at the same time
+
+        Returns:
+            Dict[str, List[SearchResult]] - The search results of each query, keyed by the query
+        """
+        if concurrency < 1:
+            raise ValueError(f"concurrency must be at least 1, got={concurrency}")
+
+        if search_params is None:
+            search_params = self.search_params.as_dict()
+        else:
+            search_params = search_params.as_dict()
+
+        search_params.pop("pageno")
+
+        # Duplicate queries would only be fetched twice to fill the same key
+        queries = list(dict.fromkeys(queries))
+        base_urls = [
+            f"{self.endpoint}?{urlencode({**search_params, 'q': query})}&pageno="
+            for query in queries
+        ]
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def fetch(
+            session: aiohttp.ClientSession, url: str
+        ) -> List[SearchResult]:
+            async with semaphore:
+                return await self._fetch_page_async(session, url)
+
+        async with aiohttp.ClientSession(headers=_HEADERS) as session:
+            pages = await asyncio.gather(
+                *[
+                    fetch(session, f"{base_url}{idx}")
+                    for base_url in base_urls
+                    for idx in range(1, n_pages + 1)
+                ]
+            )
 
-            results.extend(self.parse_api_json(response.json()))
+        results = {}
+        for query_idx, query in enumerate(queries):
+            query_results = []
+            for page in pages[query_idx * n_pages : (query_idx + 1) * n_pages]:
+                query_results.extend(page)
+            results[query] = query_results
 
         return results
 
+    def search_many(
+        self,
+        queries: List[str],
+        n_pages: int = 1,
+        search_params=None,
+        concurrency: int = 8,
+    ) -> Dict[str, List[SearchResult]]:
+        """
+        Blocking wrapper around search_many_async, see search_many_async for details
+        """
+        return asyncio.run(
+            self.search_many_async(queries, n_pages, search_params, concurrency)
+        )
+
     def search_from_sites(
         self, query: str, sites: List[str], search_params=None, n_pages: int = 1
     ):
@@ -283,11 +720,12 @@ class SearXNG:
         """
         pass
 
-    def search_from_sites_combined(
+    async def search_from_sites_combined_async(
         self, query: str, sites: List[str], search_params=None
     ):
         """
-        Preforms a search with query only on the domains specified in sites. A seperate api call is made to get results from each domain.
+        Preforms a search with query only on the domains specified in sites. A seperate api call is made to get results from each domain,
+        all of the calls are made concurrently.
 
         Ex. sites = ["amazon.com", "walmart.com"]
 
@@ -295,4 +733,33 @@ class SearXNG:
 
         Results are combined into a single results list following the order of the domains in sites
         """
-        pass
+        if search_params is None:
+            search_params = self.search_params.as_dict()
+        else:
+            search_params = search_params.as_dict()
+
+        urls = [
+            f"{self.endpoint}?{urlencode({**search_params, 'q': f'{query} site:{site}'})}"
+            for site in sites
+        ]
+
+        async with aiohttp.ClientSession(headers=_HEADERS) as session:
+            pages = await asyncio.gather(
+                *[self._fetch_page_async(session, url) for url in urls]
+            )
+
+        results = []
+        for page in pages:
+            results.extend(page)
+
+        return results
+
+    def search_from_sites_combined(
+        self, query: str, sites: List[str], search_params=None
+    ):
+        """
+        Blocking wrapper around search_from_sites_combined_async, see search_from_sites_combined_async for details
+        """
+        return asyncio.run(
+            self.search_from_sites_combined_async(query, sites, search_params)
+        )